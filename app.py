@@ -1,6 +1,13 @@
 import streamlit as st
 import re
 import json
+import time
+import logging
+import threading
+import statistics
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
 import google.generativeai as genai
 import plotly.graph_objects as go
 
@@ -11,6 +18,15 @@ GOOGLE_API_KEY = st.secrets["google"]["api_key"]
 genai.configure(api_key=GOOGLE_API_KEY)
 
 GEMINI_MODEL = "gemini-2.0-flash"
+logger = logging.getLogger(__name__)
+# Model calls allowed in flight at once across all sessions (rate-limit slots).
+GEMINI_MAX_CONCURRENT_CALLS = int(st.secrets["google"].get("max_concurrent_calls", 16))
+
+# Consistency mode: ask Gemini several times in parallel and aggregate, so
+# borderline purchases get a stable verdict. Configure under [consistency].
+CONSISTENCY_CONFIG = st.secrets.get("consistency", {})
+CONSISTENCY_ENABLED = CONSISTENCY_CONFIG.get("enabled", False)  # default for both tools
+CONSISTENCY_SAMPLES = max(1, int(CONSISTENCY_CONFIG.get("samples", 5)))
 
 # ------------------------------------------------------------
 # Custom CSS
@@ -245,6 +261,11 @@ p {
 .recommendation.neutral {
     color: #ed8936;
 }
+.decision-box .confidence {
+    margin-top: 0.5rem;
+    font-size: 0.9rem;
+    color: #718096;
+}
 
 /* Factor cards */
 .factor-card {
@@ -444,11 +465,36 @@ def create_pds_gauge(pds):
 # ------------------------------------------------------------
 # AI Logic
 # ------------------------------------------------------------
-def get_factors_from_gemini(leftover_income, has_high_interest_debt,
-                            main_financial_goal, purchase_urgency,
-                            item_name, item_cost, extra_context=None):
+NEUTRAL_FACTORS = {"D":0,"O":0,"G":0,"L":0,"B":0}
+
+class GeminiError(Exception):
+    """Raised when Gemini cannot produce usable factors."""
+
+class RequestCancelled(Exception):
+    """Raised when a request is superseded before it reaches Gemini."""
+
+@st.cache_resource
+def get_model_slots():
+    return threading.BoundedSemaphore(GEMINI_MAX_CONCURRENT_CALLS)
+
+def acquire_model_slot(cancel_event=None):
+    """Waits for a free model slot, giving up if cancel_event is set."""
+    slots = get_model_slots()
+    while True:
+        if cancel_event is not None and cancel_event.is_set():
+            record_metric("calls_cancelled")
+            raise RequestCancelled()
+        if slots.acquire(timeout=0.1):
+            return slots
+
+def request_factors_from_gemini(leftover_income, has_high_interest_debt,
+                                main_financial_goal, purchase_urgency,
+                                item_name, item_cost, extra_context=None,
+                                cancel_event=None):
     """
-    Returns factor assignments (D,O,G,L,B) from -2..+2 plus brief explanations.
+    Returns factor assignments (D,O,G,L,B) as ints from -2..+2 plus brief
+    explanations. Raises GeminiError (also for non-numeric factors) instead
+    of reporting to the page, so it is safe to call from background threads.
     """
     import google.generativeai as genai
     extra_text = f"\nAdditional user context: {extra_context}" if extra_context else ""
@@ -485,6 +531,8 @@ Return valid JSON:
 }}
     """.strip()
     
+    slots = acquire_model_slot(cancel_event)
+    record_metric("model_calls")
     try:
         model = genai.GenerativeModel(GEMINI_MODEL)
         resp = model.generate_content(
@@ -494,23 +542,161 @@ Return valid JSON:
                 max_output_tokens=512
             )
         )
-        if not resp:
-            st.error("No response from Gemini.")
-            return {"D":0,"O":0,"G":0,"L":0,"B":0}
+    except Exception as e:
+        raise GeminiError(f"Error calling Gemini: {e}") from e
+    finally:
+        slots.release()
+    if not resp:
+        raise GeminiError("No response from Gemini.")
+    try:
         text = resp.text
-        candidates = re.findall(r"(\{[\s\S]*?\})", text)
-        for c in candidates:
-            try:
-                data = json.loads(c)
-                if all(k in data for k in ["D","O","G","L","B"]):
-                    return data
-            except json.JSONDecodeError:
-                pass
-        st.error("Unable to parse valid JSON from AI output.")
-        return {"D":0,"O":0,"G":0,"L":0,"B":0}
     except Exception as e:
-        st.error(f"Error calling Gemini: {e}")
-        return {"D":0,"O":0,"G":0,"L":0,"B":0}
+        raise GeminiError(f"Error calling Gemini: {e}") from e
+    candidates = re.findall(r"(\{[\s\S]*?\})", text)
+    for c in candidates:
+        try:
+            data = json.loads(c)
+            if all(k in data for k in ["D","O","G","L","B"]):
+                return normalize_factor_sample(data)
+        except json.JSONDecodeError:
+            pass
+    raise GeminiError("Unable to parse valid JSON from AI output.")
+
+def normalize_factor_sample(sample):
+    """
+    Returns a copy of sample with each factor as an int in -2..+2.
+    Raises GeminiError if a factor is not numeric.
+    """
+    normalized = dict(sample)
+    for f in ["D","O","G","L","B"]:
+        try:
+            normalized[f] = max(-2, min(2, int(round(float(sample.get(f, 0))))))
+        except (TypeError, ValueError) as e:
+            raise GeminiError(f"Non-numeric {f} factor in AI output: {sample.get(f)!r}") from e
+    return normalized
+
+def aggregate_factor_samples(samples):
+    """
+    Combines normalized factor samples: each factor is the median of its
+    samples, rounded half to even so even sample counts are not biased up or
+    down. Explanations come from the sample closest to the result.
+    Confidence is 1 minus the average per-factor spread (max - min) over 4.
+    """
+    agg = {}
+    spreads = []
+    for f in ["D","O","G","L","B"]:
+        vals = [s[f] for s in samples]
+        agg[f] = int(round(statistics.median(vals)))
+        spreads.append(max(vals) - min(vals))
+        explained = [s for s in samples if f"{f}_explanation" in s]
+        if explained:
+            closest = min(explained, key=lambda s: abs(s[f] - agg[f]))
+            agg[f"{f}_explanation"] = closest[f"{f}_explanation"]
+    agg["confidence"] = 1 - statistics.fmean(spreads) / 4
+    agg["samples"] = len(samples)
+    return agg
+
+def verdict_is_settled(samples, remaining):
+    """
+    True if no outcome of the remaining samples can change the verdict.
+    Rounded medians are monotonic, so the extremes are all-(-2) and all-(+2)
+    samples.
+    """
+    if not samples:
+        return False
+    low = compute_pds(aggregate_factor_samples(samples + [{"D":-2,"O":-2,"G":-2,"L":-2,"B":-2}] * remaining))
+    high = compute_pds(aggregate_factor_samples(samples + [{"D":2,"O":2,"G":2,"L":2,"B":2}] * remaining))
+    return get_recommendation(low) == get_recommendation(high)
+
+def request_consistent_factors(leftover_income, has_high_interest_debt,
+                               main_financial_goal, purchase_urgency,
+                               item_name, item_cost, extra_context=None,
+                               samples=CONSISTENCY_SAMPLES, cancel_event=None):
+    """
+    Asks Gemini up to `samples` times and aggregates with
+    aggregate_factor_samples. A majority of the samples is requested
+    concurrently and failed ones are replaced. If they are all back and the
+    verdict is still open, the rest are requested at once, so clear-cut
+    purchases never pay for the full set and borderline ones wait for at
+    most two rounds.
+    Raises GeminiError if every sample fails, RequestCancelled if
+    cancel_event is set first.
+    """
+    results = []
+    last_error = None
+    pool = ThreadPoolExecutor(max_workers=samples, thread_name_prefix="munger-sample")
+    
+    def submit():
+        return pool.submit(
+            request_factors_from_gemini,
+            leftover_income,
+            has_high_interest_debt,
+            main_financial_goal,
+            purchase_urgency,
+            item_name,
+            item_cost,
+            extra_context=extra_context,
+            cancel_event=cancel_event
+        )
+    
+    try:
+        launched = min(samples, samples // 2 + 1)
+        running = {submit() for _ in range(launched)}
+        finished = 0
+        while running:
+            done, running = wait(running, timeout=0.1, return_when=FIRST_COMPLETED)
+            if cancel_event is not None and cancel_event.is_set():
+                raise RequestCancelled()
+            if not done:
+                continue
+            failed = 0
+            for fut in done:
+                finished += 1
+                try:
+                    results.append(fut.result())
+                except GeminiError as e:
+                    last_error = e
+                    failed += 1
+            if verdict_is_settled(results, samples - finished):
+                break
+            for _ in range(min(failed if running else samples, samples - launched)):
+                running.add(submit())
+                launched += 1
+    finally:
+        # Anything still running is abandoned; its result is ignored.
+        pool.shutdown(wait=False, cancel_futures=True)
+    if not results:
+        raise last_error
+    factors = aggregate_factor_samples(results)
+    factors["calls"] = launched
+    return factors
+
+def get_factors_from_gemini(leftover_income, has_high_interest_debt,
+                            main_financial_goal, purchase_urgency,
+                            item_name, item_cost, extra_context=None,
+                            samples=1):
+    """
+    Same as request_factors_from_gemini (or request_consistent_factors when
+    samples > 1), but deduplicated per session by run_tracked_request, shows
+    errors on the page and falls back to neutral factors.
+    """
+    request = request_consistent_factors if samples > 1 else request_factors_from_gemini
+    extra = {"samples": samples} if samples > 1 else {}
+    try:
+        return run_tracked_request(
+            request,
+            leftover_income,
+            has_high_interest_debt,
+            main_financial_goal,
+            purchase_urgency,
+            item_name,
+            item_cost,
+            extra_context=extra_context,
+            **extra
+        )
+    except GeminiError as e:
+        st.error(str(e))
+        return dict(NEUTRAL_FACTORS)
 
 def compute_pds(factors):
     return sum(factors.get(f,0) for f in ["D","O","G","L","B"])
@@ -523,6 +709,311 @@ def get_recommendation(pds):
     else:
         return "Consider carefully.", "neutral"
 
+# ------------------------------------------------------------
+# Request Tracking
+# ------------------------------------------------------------
+# Each session has at most one model request in flight. Submitting the same
+# inputs again (e.g. a double-click) waits on that request instead of
+# starting another; submitting different inputs cancels it. A request that
+# has not reached Gemini yet gives up its place and never makes the call.
+# A call already sent cannot be interrupted, so its result is just dropped.
+SHOW_METRICS = st.secrets.get("metrics", {}).get("show_in_sidebar", False)
+DUPLICATE_SUBMIT_WINDOW_SECONDS = 5  # identical submits this soon after a finish reuse it
+REQUEST_POOL_SIZE = 32
+
+@st.cache_resource
+def get_request_pool():
+    return ThreadPoolExecutor(max_workers=REQUEST_POOL_SIZE, thread_name_prefix="munger-request")
+
+@st.cache_resource
+def get_request_metrics():
+    return {"lock": threading.Lock(), "counts": Counter()}
+
+def record_metric(name, amount=1):
+    metrics = get_request_metrics()
+    with metrics["lock"]:
+        metrics["counts"][name] += amount
+
+def get_metrics_snapshot():
+    """
+    Process-wide counters. calls_saved counts model requests avoided by the
+    Decision Tool cache, duplicate submits and cancelled requests.
+    """
+    metrics = get_request_metrics()
+    with metrics["lock"]:
+        counts = Counter(metrics["counts"])
+    counts["calls_saved"] = counts["cache_hits"] + counts["duplicate_submits"] + counts["calls_cancelled"]
+    return counts
+
+def wait_for_request(future):
+    """
+    Waits for future while giving Streamlit a chance to stop this run, so a
+    resubmit is handled at once rather than after the stale call returns.
+    """
+    heartbeat = st.empty()
+    while True:
+        try:
+            return future.result(timeout=0.25)
+        except FutureTimeoutError:
+            heartbeat.empty()
+
+def run_tracked_request(fn, *args, **kwargs):
+    """
+    Runs fn(*args, cancel_event=..., **kwargs) on the request pool for the
+    current session and returns its result (or raises its exception).
+    Only a running or recently successful request is reused; a failed one is
+    retried.
+    """
+    record_metric("submits")
+    key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+    inflight = st.session_state.get("inflight_request")
+    now = time.time()
+    previous = inflight["future"] if inflight is not None and inflight["key"] == key else None
+    if previous is not None and (
+        not previous.done()
+        or (
+            not previous.cancelled()
+            and previous.exception() is None
+            and now - inflight.get("finished_at", now) <= DUPLICATE_SUBMIT_WINDOW_SECONDS
+        )
+    ):
+        record_metric("duplicate_submits")
+        return wait_for_request(previous)
+    
+    if inflight is not None and not inflight["future"].done():
+        inflight["cancel"].set()
+        if inflight["future"].cancel():
+            # Never started, so none of its model calls were made.
+            record_metric("calls_cancelled")
+        record_metric("superseded")
+    
+    cancel = threading.Event()
+    future = get_request_pool().submit(fn, *args, cancel_event=cancel, **kwargs)
+    inflight = {"key": key, "future": future, "cancel": cancel}
+    future.add_done_callback(lambda _: inflight.setdefault("finished_at", time.time()))
+    st.session_state["inflight_request"] = inflight
+    return wait_for_request(future)
+
+# ------------------------------------------------------------
+# Decision Cache & Warm-up
+# ------------------------------------------------------------
+# The Decision Tool fills every input except item and cost with fixed
+# defaults, so its results are cached per (item, cost). A background job
+# precomputes the most requested pairs off-peak and refreshes hot entries
+# before they expire. Override any value under [warmup] in secrets.toml.
+WARMUP_CONFIG = st.secrets.get("warmup", {})
+WARMUP_ENABLED = WARMUP_CONFIG.get("enabled", True)
+WARMUP_CALL_BUDGET = int(WARMUP_CONFIG.get("call_budget", 25))          # model calls per pass
+WARMUP_INTERVAL_SECONDS = int(WARMUP_CONFIG.get("interval_seconds", 900))
+WARMUP_OFF_PEAK_HOURS = list(WARMUP_CONFIG.get("off_peak_hours", [1, 2, 3, 4, 5]))
+CACHE_TTL_SECONDS = int(WARMUP_CONFIG.get("ttl_seconds", 6 * 60 * 60))
+CACHE_REFRESH_MARGIN_SECONDS = int(WARMUP_CONFIG.get("refresh_margin_seconds", 30 * 60))
+CACHE_MAX_ENTRIES = int(WARMUP_CONFIG.get("max_entries", 500))  # ~85 KB each (two figures)
+TRAFFIC_WINDOW_SECONDS = int(WARMUP_CONFIG.get("traffic_window_seconds", 24 * 60 * 60))
+WARMUP_SEED_QUERIES = [
+    (name, float(cost)) for name, cost in WARMUP_CONFIG.get("seed_queries", [
+        ("New Laptop", 500),
+        ("New Laptop", 1000),
+        ("iPhone", 1000),
+        ("Gaming Console", 500),
+        ("Headphones", 200),
+        ("TV", 1000),
+    ])
+]
+
+def basic_query_key(item_name, cost):
+    """Cache key for a Decision Tool query: normalized item name + cost."""
+    return (" ".join(item_name.split()).lower(), round(float(cost), 2))
+
+def basic_query_inputs(cost):
+    """Fixed defaults used by the Decision Tool."""
+    return {
+        "leftover_income": max(1000, cost * 2),
+        "has_high_interest_debt": "No",
+        "main_financial_goal": "Save for emergencies",
+        "purchase_urgency": "Mixed",
+    }
+
+@st.cache_resource
+def get_decision_cache():
+    """Process-wide cache shared by all sessions and the warm-up worker."""
+    return {
+        "lock": threading.Lock(),
+        "entries": OrderedDict(),       # key -> {"result", "expires_at"}, least recently used first
+        "names": OrderedDict(),         # key -> item name as last typed, same order
+        "traffic": deque(maxlen=10000), # (timestamp, key)
+    }
+
+def build_decision(factors):
+    """Everything needed to render a result, including chart payloads."""
+    pds = compute_pds(factors)
+    rec_text, rec_class = get_recommendation(pds)
+    return {
+        "factors": factors,
+        "pds": pds,
+        "rec_text": rec_text,
+        "rec_class": rec_class,
+        "radar_fig": create_radar_chart(factors),
+        "gauge_fig": create_pds_gauge(pds),
+    }
+
+def compute_basic_decision(item_name, cost, cancel_event=None):
+    """Calls Gemini for a Decision Tool query. Raises GeminiError."""
+    request = request_consistent_factors if CONSISTENCY_ENABLED else request_factors_from_gemini
+    factors = request(
+        item_name=item_name,
+        item_cost=cost,
+        cancel_event=cancel_event,
+        **basic_query_inputs(cost)
+    )
+    return build_decision(factors)
+
+def _touch(mapping, key, value):
+    """Inserts or refreshes key as most recently used, evicting past CACHE_MAX_ENTRIES."""
+    mapping[key] = value
+    mapping.move_to_end(key)
+    while len(mapping) > CACHE_MAX_ENTRIES:
+        mapping.popitem(last=False)
+
+def store_basic_decision(key, result, now=None):
+    cache = get_decision_cache()
+    now = time.time() if now is None else now
+    with cache["lock"]:
+        _touch(cache["entries"], key, {"result": result, "expires_at": now + CACHE_TTL_SECONDS})
+
+def evict_expired_decisions(now=None):
+    """Drops expired entries. Returns how many were removed."""
+    cache = get_decision_cache()
+    now = time.time() if now is None else now
+    with cache["lock"]:
+        expired = [key for key, entry in cache["entries"].items() if entry["expires_at"] <= now]
+        for key in expired:
+            del cache["entries"][key]
+    return len(expired)
+
+def compute_and_store_basic_decision(item_name, cost, cancel_event=None):
+    """
+    compute_basic_decision plus caching, run on the request pool so a result
+    is kept even if the page run that asked for it was stopped.
+    """
+    result = compute_basic_decision(item_name, cost, cancel_event=cancel_event)
+    store_basic_decision(basic_query_key(item_name, cost), result)
+    return result
+
+def get_basic_decision(item_name, cost):
+    """
+    Returns the Decision Tool result for (item_name, cost), served from the
+    cache when possible. Failed calls are shown on the page and not cached.
+    """
+    cache = get_decision_cache()
+    key = basic_query_key(item_name, cost)
+    now = time.time()
+    with cache["lock"]:
+        cache["traffic"].append((now, key))
+        _touch(cache["names"], key, item_name)
+        entry = cache["entries"].get(key)
+        if entry is not None:
+            cache["entries"].move_to_end(key)
+    if entry and entry["expires_at"] > now:
+        record_metric("cache_hits")
+        return entry["result"]
+    
+    try:
+        return run_tracked_request(compute_and_store_basic_decision, item_name, cost)
+    except GeminiError as e:
+        st.error(str(e))
+        return build_decision(dict(NEUTRAL_FACTORS))
+
+def rank_hot_queries(now=None):
+    """Recent Decision Tool keys, most requested first, followed by the seed list."""
+    cache = get_decision_cache()
+    now = time.time() if now is None else now
+    with cache["lock"]:
+        counts = Counter(key for ts, key in cache["traffic"] if now - ts <= TRAFFIC_WINDOW_SECONDS)
+    ranked = [key for key, _ in counts.most_common()]
+    for name, cost in WARMUP_SEED_QUERIES:
+        key = basic_query_key(name, cost)
+        if key not in counts:
+            ranked.append(key)
+    return ranked
+
+def select_warmup_keys(include_cold, now=None):
+    """
+    Hot keys whose entry is about to expire, plus (if include_cold) hot keys
+    that are missing or already expired.
+    """
+    cache = get_decision_cache()
+    now = time.time() if now is None else now
+    selected = []
+    for key in rank_hot_queries(now):
+        with cache["lock"]:
+            entry = cache["entries"].get(key)
+        if entry is None or entry["expires_at"] <= now:
+            if include_cold:
+                selected.append(key)
+        elif entry["expires_at"] - now <= CACHE_REFRESH_MARGIN_SECONDS:
+            selected.append(key)
+    return selected
+
+def run_warmup_pass(call_budget=WARMUP_CALL_BUDGET, include_cold=True):
+    """
+    Precomputes hot queries until call_budget model calls are spent. A query
+    is only started if its worst case (K calls in consistency mode) still
+    fits. Returns the number of entries written.
+    """
+    cache = get_decision_cache()
+    evict_expired_decisions()
+    worst_case = CONSISTENCY_SAMPLES if CONSISTENCY_ENABLED else 1
+    calls = 0
+    warmed = 0
+    for key in select_warmup_keys(include_cold):
+        if calls + worst_case > call_budget:
+            break
+        with cache["lock"]:
+            item_name = cache["names"].get(key)
+        if item_name is None:
+            item_name = next((n for n, c in WARMUP_SEED_QUERIES if basic_query_key(n, c) == key), key[0])
+        try:
+            result = compute_basic_decision(item_name, key[1])
+        except GeminiError as e:
+            logger.warning("Warm-up skipped %r: %s", key, e)
+            record_metric("warmup_errors")
+            calls += worst_case
+            continue
+        except Exception:
+            # A malformed reply must not end the pass (or the worker).
+            logger.exception("Warm-up failed for %r", key)
+            record_metric("warmup_errors")
+            calls += worst_case
+            continue
+        calls += result["factors"].get("calls", 1)
+        store_basic_decision(key, result)
+        warmed += 1
+    return warmed
+
+def is_off_peak(now=None):
+    now = time.time() if now is None else now
+    return time.localtime(now).tm_hour in WARMUP_OFF_PEAK_HOURS
+
+def _warmup_loop():
+    # start_warmup_worker never restarts this thread, so a failed pass is
+    # logged and counted, and the next one runs as scheduled.
+    while True:
+        try:
+            # Off-peak: fill the cache. Peak: only refresh entries about to expire.
+            run_warmup_pass(include_cold=is_off_peak())
+        except Exception:
+            logger.exception("Warm-up pass failed")
+            record_metric("warmup_failures")
+        time.sleep(WARMUP_INTERVAL_SECONDS)
+
+@st.cache_resource
+def start_warmup_worker():
+    """Starts the warm-up thread once per process."""
+    worker = threading.Thread(target=_warmup_loop, name="munger-warmup", daemon=True)
+    worker.start()
+    return worker
+
 # ------------------------------------------------------------
 # Additional UI Helpers
 # ------------------------------------------------------------
@@ -553,10 +1044,50 @@ def render_factor_card(factor, value, description):
     </div>
     """, unsafe_allow_html=True)
 
+def render_decision(item_name, cost, decision):
+    factors = decision["factors"]
+    confidence_html = ""
+    if "confidence" in factors:
+        confidence_html = (
+            f'<div class="confidence">Confidence {factors["confidence"]:.0%} '
+            f'&middot; {factors["samples"]} sample{"s" if factors["samples"] != 1 else ""}</div>'
+        )
+    render_item_card(item_name, cost)
+    st.markdown(f"""
+    <div class="decision-box">
+        <h2>Purchase Decision Score</h2>
+        <div class="score">{decision["pds"]}</div>
+        <div class="recommendation {decision["rec_class"]}">{decision["rec_text"]}</div>
+        {confidence_html}
+    </div>
+    """, unsafe_allow_html=True)
+    
+    c1, c2 = st.columns(2)
+    with c1:
+        st.markdown("### Decision Factors")
+        factor_labels = {
+            "D": "Discretionary Income",
+            "O": "Opportunity Cost",
+            "G": "Goal Alignment",
+            "L": "Long-Term Impact",
+            "B": "Behavioral"
+        }
+        for f in ["D","O","G","L","B"]:
+            render_factor_card(f, factors[f], factor_labels[f])
+            if f"{f}_explanation" in factors:
+                st.caption(factors[f"{f}_explanation"])
+    with c2:
+        st.markdown("### Factor Analysis")
+        st.plotly_chart(decision["radar_fig"], use_container_width=True)
+        st.plotly_chart(decision["gauge_fig"], use_container_width=True)
+
 # ------------------------------------------------------------
 # Main App
 # ------------------------------------------------------------
 def main():
+    if WARMUP_ENABLED:
+        start_warmup_worker()
+    
     with st.sidebar:
         render_logo()
         st.markdown("##### Decision Assistant")
@@ -573,6 +1104,18 @@ def main():
         - Score above 5 = buy
         """)
         
+        if SHOW_METRICS:
+            st.markdown("---")
+            counts = get_metrics_snapshot()
+            with st.expander("Usage Metrics"):
+                st.markdown(f"""
+                - Model calls: {counts["model_calls"]}
+                - Calls saved: {counts["calls_saved"]}
+                - Cache hits: {counts["cache_hits"]}
+                - Duplicate submits ignored: {counts["duplicate_submits"]}
+                - Superseded requests: {counts["superseded"]}
+                """)
+        
         st.markdown("---")
         st.markdown("© 2025 Munger AI")
     
@@ -601,53 +1144,8 @@ def main():
         
         if submit_btn:
             with st.spinner("Analyzing with AI..."):
-                # Minimal logic for leftover etc. (could be expanded)
-                leftover_income = max(1000, cost * 2)
-                has_high_interest_debt = "No"
-                main_financial_goal = "Save for emergencies"
-                purchase_urgency = "Mixed"
-                
-                factors = get_factors_from_gemini(
-                    leftover_income,
-                    has_high_interest_debt,
-                    main_financial_goal,
-                    purchase_urgency,
-                    item_name,
-                    cost
-                )
-                pds = compute_pds(factors)
-                rec_text, rec_class = get_recommendation(pds)
-                
-                render_item_card(item_name, cost)
-                st.markdown(f"""
-                <div class="decision-box">
-                    <h2>Purchase Decision Score</h2>
-                    <div class="score">{pds}</div>
-                    <div class="recommendation {rec_class}">{rec_text}</div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                c1, c2 = st.columns(2)
-                with c1:
-                    st.markdown("### Decision Factors")
-                    factor_labels = {
-                        "D": "Discretionary Income",
-                        "O": "Opportunity Cost",
-                        "G": "Goal Alignment",
-                        "L": "Long-Term Impact",
-                        "B": "Behavioral"
-                    }
-                    for f in ["D","O","G","L","B"]:
-                        render_factor_card(f, factors[f], factor_labels[f])
-                        if f"{f}_explanation" in factors:
-                            st.caption(factors[f"{f}_explanation"])
-                with c2:
-                    st.markdown("### Factor Analysis")
-                    radar_fig = create_radar_chart(factors)
-                    st.plotly_chart(radar_fig, use_container_width=True)
-                    
-                    gauge_fig = create_pds_gauge(pds)
-                    st.plotly_chart(gauge_fig, use_container_width=True)
+                decision = get_basic_decision(item_name, cost)
+                render_decision(item_name, cost, decision)
     
     # -----------------------------------
     # 2. Advanced Tool
@@ -671,6 +1169,10 @@ def main():
             
             st.subheader("Optional Extra Context")
             extra_notes = st.text_area("Any additional context or notes?")
+            consistency_mode = st.checkbox(
+                f"Consistency mode (up to {CONSISTENCY_SAMPLES} AI samples for a more stable verdict)",
+                value=CONSISTENCY_ENABLED
+            )
             
             advanced_submit = st.form_submit_button("Analyze My Purchase")
         
@@ -683,41 +1185,10 @@ def main():
                     urgency,
                     item_name,
                     item_cost,
-                    extra_context=extra_notes
+                    extra_context=extra_notes,
+                    samples=CONSISTENCY_SAMPLES if consistency_mode else 1
                 )
-                pds = compute_pds(factors)
-                rec_text, rec_class = get_recommendation(pds)
-                
-                render_item_card(item_name, item_cost)
-                st.markdown(f"""
-                <div class="decision-box">
-                    <h2>Purchase Decision Score</h2>
-                    <div class="score">{pds}</div>
-                    <div class="recommendation {rec_class}">{rec_text}</div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                c1, c2 = st.columns(2)
-                with c1:
-                    st.markdown("### Decision Factors")
-                    factor_labels = {
-                        "D": "Discretionary Income",
-                        "O": "Opportunity Cost",
-                        "G": "Goal Alignment",
-                        "L": "Long-Term Impact",
-                        "B": "Behavioral"
-                    }
-                    for f in ["D","O","G","L","B"]:
-                        render_factor_card(f, factors[f], factor_labels[f])
-                        if f"{f}_explanation" in factors:
-                            st.caption(factors[f"{f}_explanation"])
-                with c2:
-                    st.markdown("### Factor Analysis")
-                    radar_fig = create_radar_chart(factors)
-                    st.plotly_chart(radar_fig, use_container_width=True)
-                    
-                    gauge_fig = create_pds_gauge(pds)
-                    st.plotly_chart(gauge_fig, use_container_width=True)
+                render_decision(item_name, item_cost, build_decision(factors))
 
 # ------------------------------------------------------------
 # Run the App
@@ -0,0 +1,284 @@
+"""
+Load test for the Munger AI Streamlit app.
+
+Drives app.py's main() through Streamlit's headless AppTest with a stubbed
+Gemini backend, ramping up the number of concurrent virtual users. Each
+virtual user is its own app session and submits the Decision Tool or the
+Advanced Tool form. Per ramp step it reports throughput, latency
+percentiles, and memory and CPU per session.
+
+Usage:
+    python loadtest.py --users 1,2,4,8,16 --submissions 5 --model-latency-ms 800
+    python loadtest.py --p95-limit-ms 2000 --json loadtest.json
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+import google.generativeai as genai
+import streamlit as st
+from streamlit import config
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.runtime.secrets import Secrets
+from unittest.mock import MagicMock
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+APP_SECRETS = {
+    "google": {"api_key": "load-test"},
+    # Keep the background warm-up job from competing with virtual users.
+    "warmup": {"enabled": False},
+}
+
+# ------------------------------------------------------------
+# Stubbed Gemini backend
+# ------------------------------------------------------------
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+class StubGenerativeModel:
+    """Stands in for genai.GenerativeModel: fixed latency, random valid factors."""
+    latency_seconds = 0.5
+    calls = 0
+    _lock = threading.Lock()
+
+    def __init__(self, model_name, *args, **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, prompt, generation_config=None, **kwargs):
+        with StubGenerativeModel._lock:
+            StubGenerativeModel.calls += 1
+        time.sleep(self.latency_seconds)
+        factors = {f: random.randint(-2, 2) for f in ["D","O","G","L","B"]}
+        for f in ["D","O","G","L","B"]:
+            factors[f"{f}_explanation"] = "Stubbed explanation."
+        return StubResponse(json.dumps(factors))
+
+def prepare_concurrent_app_test():
+    """
+    AppTest is written for one run at a time: every run installs a mock
+    Runtime, the "global.appTest" option and st.secrets, then resets them on
+    exit. With several sessions running at once, a reset in one thread makes
+    forms, widget values or secrets disappear in another (clicks are silently
+    lost), so pin all three for the whole test.
+
+    Each run also recompiles app.py in a fresh ScriptCache, and concurrent
+    compiles can fail on CPython 3.11. Share one cache across sessions, as a
+    real server does.
+    """
+    shared_bytecode, shared_lock = {}, threading.Lock()
+    def shared_script_cache_init(self):
+        self._cache = shared_bytecode
+        self._lock = shared_lock
+    ScriptCache.__init__ = shared_script_cache_init
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.exists = classmethod(lambda cls: True)
+    Runtime.instance = classmethod(lambda cls: cls._instance or runtime)
+    config.get_config_options()
+    config._set_option("global.appTest", True, "loadtest")
+    secrets = Secrets()
+    secrets._secrets = APP_SECRETS
+    st.secrets = secrets
+
+def install_stub_backend(latency_seconds):
+    StubGenerativeModel.latency_seconds = latency_seconds
+    genai.configure = lambda *args, **kwargs: None
+    genai.GenerativeModel = StubGenerativeModel
+
+# ------------------------------------------------------------
+# Measurement Helpers
+# ------------------------------------------------------------
+def current_memory_bytes():
+    """Resident set size of this process (Linux), or 0 if unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def percentile(values, pct):
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[idx]
+
+# ------------------------------------------------------------
+# Virtual Users
+# ------------------------------------------------------------
+def _widget(widgets, label):
+    return next(w for w in widgets if w.label == label)
+
+def new_session(timeout):
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.secrets.update(APP_SECRETS)
+    at.run()
+    return at
+
+def submit_decision_tool(at, item_name, cost):
+    if at.sidebar.radio[0].value != "Decision Tool":
+        at.sidebar.radio[0].set_value("Decision Tool").run()
+    _widget(at.text_input, "What are you buying?").input(item_name)
+    _widget(at.number_input, "Cost ($)").set_value(cost)
+    start = time.perf_counter()
+    _widget(at.button, "Should I Buy It?").click().run()
+    return time.perf_counter() - start
+
+def submit_advanced_tool(at, item_name, cost, rng):
+    if at.sidebar.radio[0].value != "Advanced Tool":
+        at.sidebar.radio[0].set_value("Advanced Tool").run()
+    _widget(at.text_input, "Item Name").input(item_name)
+    _widget(at.number_input, "Item Cost ($)").set_value(cost)
+    _widget(at.number_input, "Monthly Leftover Income ($)").set_value(float(rng.choice([500, 1500, 4000])))
+    _widget(at.selectbox, "High-Interest Debt?").select(rng.choice(["No", "Yes"]))
+    _widget(at.text_input, "Main Financial Goal").input(rng.choice(["Build an emergency fund", "Retire early"]))
+    _widget(at.selectbox, "Purchase Urgency").select(rng.choice(["Urgent Needs","Mixed","Mostly Wants"]))
+    _widget(at.text_area, "Any additional context or notes?").input("Simulated load-test user.")
+    start = time.perf_counter()
+    _widget(at.button, "Analyze My Purchase").click().run()
+    return time.perf_counter() - start
+
+def run_virtual_user(at, user_id, step, args, results):
+    rng = random.Random(f"{step}-{user_id}")
+    for i in range(args.submissions):
+        if args.repeat_items:
+            item_name, cost = "New Laptop", 500.0
+        else:
+            # Unique inputs so the Decision Tool cache cannot hide model latency.
+            item_name, cost = f"Load Item {step}-{user_id}-{i}", float(rng.randint(10, 5000))
+        try:
+            if rng.random() < args.advanced_ratio:
+                latency = submit_advanced_tool(at, item_name, cost, rng)
+            else:
+                latency = submit_decision_tool(at, item_name, cost)
+        except Exception as e:
+            results["errors"].append(f"user {user_id}: {e}")
+            continue
+        if at.exception:
+            results["errors"].append(f"user {user_id}: {at.exception[0].message}")
+        elif not any("Purchase Decision Score" in m.value for m in at.markdown):
+            results["errors"].append(f"user {user_id}: submission rendered no decision")
+        else:
+            results["latencies"].append(latency)
+        if args.think_time_ms:
+            time.sleep(args.think_time_ms / 1000)
+
+def run_step(n_users, args):
+    """Runs one ramp step with n_users concurrent sessions."""
+    gc.collect()
+    mem_before = current_memory_bytes()
+    sessions = [new_session(args.timeout) for _ in range(n_users)]
+    results = {"latencies": [], "errors": []}
+    calls_before = StubGenerativeModel.calls
+    cpu_before = time.process_time()
+    wall_before = time.perf_counter()
+    threads = [
+        threading.Thread(target=run_virtual_user, args=(at, uid, n_users, args, results))
+        for uid, at in enumerate(sessions)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - wall_before
+    cpu = time.process_time() - cpu_before
+    gc.collect()
+    # Sessions are still alive here, so their state counts toward the delta.
+    mem_after = current_memory_bytes()
+    latencies_ms = [l * 1000 for l in results["latencies"]]
+    completed = len(latencies_ms)
+    step = {
+        "users": n_users,
+        "submissions": completed,
+        "errors": len(results["errors"]),
+        "model_calls": StubGenerativeModel.calls - calls_before,
+        "throughput_rps": completed / wall if wall else 0.0,
+        "p50_ms": percentile(latencies_ms, 50),
+        "p90_ms": percentile(latencies_ms, 90),
+        "p95_ms": percentile(latencies_ms, 95),
+        "p99_ms": percentile(latencies_ms, 99),
+        "mean_ms": statistics.fmean(latencies_ms) if latencies_ms else 0.0,
+        "mem_per_session_mb": max(0, mem_after - mem_before) / n_users / 2**20,
+        "cpu_per_session_s": cpu / n_users,
+        "cpu_per_submission_ms": cpu * 1000 / completed if completed else 0.0,
+        "error_samples": results["errors"][:5],
+    }
+    del sessions
+    return step
+
+# ------------------------------------------------------------
+# Reporting
+# ------------------------------------------------------------
+def print_step(step):
+    print(
+        f"{step['users']:>5} {step['submissions']:>7} {step['errors']:>6} "
+        f"{step['throughput_rps']:>9.2f} {step['p50_ms']:>8.0f} {step['p95_ms']:>8.0f} "
+        f"{step['p99_ms']:>8.0f} {step['mem_per_session_mb']:>10.2f} {step['cpu_per_session_s']:>10.3f}"
+    )
+    for err in step["error_samples"]:
+        print(f"      ! {err}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ramp simulated users against the Munger AI app.")
+    parser.add_argument("--users", default="1,2,4,8", help="comma-separated concurrent users per ramp step")
+    parser.add_argument("--submissions", type=int, default=5, help="form submissions per user per step")
+    parser.add_argument("--advanced-ratio", type=float, default=0.3, help="share of submissions using the Advanced Tool")
+    parser.add_argument("--model-latency-ms", type=float, default=500, help="stubbed Gemini latency")
+    parser.add_argument("--think-time-ms", type=float, default=0, help="pause between a user's submissions")
+    parser.add_argument("--repeat-items", action="store_true",
+                        help="always submit the same item (exercises the cache, which is otherwise disabled)")
+    parser.add_argument("--p95-limit-ms", type=float, default=None, help="stop ramping once p95 latency exceeds this")
+    parser.add_argument("--timeout", type=float, default=60, help="per-rerun timeout in seconds")
+    parser.add_argument("--json", dest="json_path", help="also write results to this file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.repeat_items:
+        # Unique items never hit the Decision Tool cache, but every stored
+        # entry (~85 KB) would show up as per-session memory. Keep it empty.
+        APP_SECRETS["warmup"]["max_entries"] = 0
+    install_stub_backend(args.model_latency_ms / 1000)
+    prepare_concurrent_app_test()
+    steps = [int(n) for n in args.users.split(",") if n.strip()]
+
+    print(f"Stubbed model latency: {args.model_latency_ms:.0f} ms, {args.submissions} submissions/user")
+    print(f"{'users':>5} {'submits':>7} {'errors':>6} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'MB/sess':>10} {'CPU s/sess':>10}")
+    report = {"config": vars(args), "steps": [], "max_users_within_limit": None}
+    for n_users in steps:
+        step = run_step(n_users, args)
+        report["steps"].append(step)
+        print_step(step)
+        if args.p95_limit_ms is not None:
+            if step["p95_ms"] > args.p95_limit_ms:
+                print(f"p95 {step['p95_ms']:.0f} ms exceeds {args.p95_limit_ms:.0f} ms limit; stopping ramp.")
+                break
+            report["max_users_within_limit"] = n_users
+
+    if args.p95_limit_ms is not None:
+        print(f"Max concurrent users within p95 limit: {report['max_users_within_limit']}")
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if any(s["errors"] for s in report["steps"]) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
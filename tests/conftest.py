@@ -0,0 +1,51 @@
+"""
+Imports app.py outside `streamlit run`: test secrets are installed before
+import, and Gemini is replaced by StubModel (see the `gemini` fixture).
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+import google.generativeai as genai
+import pytest
+import streamlit as st
+from streamlit.runtime.secrets import Secrets
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_secrets = Secrets()
+_secrets._secrets = {"google": {"api_key": "test"}, "warmup": {"enabled": False}}
+st.secrets = _secrets
+genai.configure = lambda *args, **kwargs: None
+
+import app  # noqa: E402
+
+
+class StubModel:
+    """genai.GenerativeModel stand-in: returns `reply()`, sleeping `latency()`."""
+    reply = staticmethod(lambda: {"D":2,"O":2,"G":2,"L":2,"B":2})
+    latency = staticmethod(lambda: 0)
+    calls = 0
+    _lock = threading.Lock()
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def generate_content(self, prompt, **kwargs):
+        with StubModel._lock:
+            StubModel.calls += 1
+        time.sleep(StubModel.latency())
+        return type("Resp", (), {"text": json.dumps(StubModel.reply())})()
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    monkeypatch.setattr(genai, "GenerativeModel", StubModel)
+    monkeypatch.setattr(StubModel, "calls", 0)
+    monkeypatch.setattr(StubModel, "reply", staticmethod(lambda: {"D":2,"O":2,"G":2,"L":2,"B":2}))
+    monkeypatch.setattr(StubModel, "latency", staticmethod(lambda: 0))
+    random.seed(0)
+    return StubModel
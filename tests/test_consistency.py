@@ -0,0 +1,60 @@
+import random
+import time
+
+import pytest
+
+from conftest import app
+
+ZEROS = {"D":0,"O":0,"G":0,"L":0,"B":0}
+TWOS = {"D":2,"O":2,"G":2,"L":2,"B":2}
+
+
+def test_aggregate_is_symmetric_for_even_sample_counts():
+    factors = app.aggregate_factor_samples([ZEROS, TWOS])
+    assert app.compute_pds(factors) == 5
+    assert app.compute_pds(app.aggregate_factor_samples([dict(ZEROS), {f: -2 for f in ZEROS}])) == -5
+
+
+def test_non_numeric_factor_is_rejected():
+    with pytest.raises(app.GeminiError):
+        app.normalize_factor_sample(dict(ZEROS, D="high"))
+
+
+def test_non_numeric_sample_is_dropped(gemini):
+    replies = [dict(TWOS, D="high")] + [TWOS] * 10
+    gemini.reply = staticmethod(lambda: replies.pop(0))
+    factors = app.request_consistent_factors(1000, "No", "Save", "Mixed", "Laptop", 500.0, samples=5)
+    assert app.compute_pds(factors) == 10
+    # The bad sample is dropped. How many follow depends on finishing order,
+    # and a sample still running at the early stop is abandoned.
+    assert 3 <= factors["samples"] <= gemini.calls - 1
+    assert factors["calls"] == gemini.calls
+
+
+def test_clear_cut_verdict_stops_at_majority_with_uneven_latency(gemini):
+    gemini.latency = staticmethod(lambda: random.uniform(0.02, 0.1))
+    for _ in range(5):
+        gemini.calls = 0
+        factors = app.request_consistent_factors(1000, "No", "Save", "Mixed", "Laptop", 500.0, samples=5)
+        assert factors["samples"] == 3
+        assert gemini.calls == 3
+
+
+def test_open_verdict_requests_more_samples(gemini):
+    replies = [ZEROS, ZEROS, TWOS, TWOS, TWOS]
+    gemini.reply = staticmethod(lambda: replies.pop(0))
+    factors = app.request_consistent_factors(1000, "No", "Save", "Mixed", "Laptop", 500.0, samples=5)
+    assert gemini.calls == 5
+    assert factors["samples"] == 5
+    assert app.compute_pds(factors) == 10
+
+
+def test_open_verdict_requests_the_rest_concurrently(gemini):
+    replies = [ZEROS, ZEROS, TWOS, TWOS, TWOS]
+    gemini.reply = staticmethod(lambda: replies.pop(0))
+    gemini.latency = staticmethod(lambda: 0.2)
+    start = time.perf_counter()
+    app.request_consistent_factors(1000, "No", "Save", "Mixed", "Laptop", 500.0, samples=5)
+    # Two rounds (first wave, then the remaining two together), not three.
+    assert time.perf_counter() - start < 0.55
+    assert gemini.calls == 5
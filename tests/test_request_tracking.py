@@ -0,0 +1,116 @@
+import threading
+import time
+
+import pytest
+
+from conftest import app
+
+
+@pytest.fixture
+def session(monkeypatch):
+    state = {}
+    monkeypatch.setattr(app.st, "session_state", state)
+    return state
+
+
+def ask(item_name="Laptop", cost=500.0):
+    return app.run_tracked_request(app.request_factors_from_gemini, 1000, "No", "Save", "Mixed", item_name, cost)
+
+
+def test_failed_request_is_retried_not_reused(gemini, session):
+    replies = [{"D":"high"}, {"D":2,"O":2,"G":2,"L":2,"B":2}]
+    gemini.reply = staticmethod(lambda: dict({"O":0,"G":0,"L":0,"B":0}, **replies.pop(0)))
+    duplicates_before = app.get_metrics_snapshot()["duplicate_submits"]
+    with pytest.raises(app.GeminiError):
+        ask()
+    assert app.compute_pds(ask()) == 10
+    assert gemini.calls == 2
+    assert app.get_metrics_snapshot()["duplicate_submits"] == duplicates_before
+
+
+def in_thread(fn, *args):
+    """Runs fn in a thread; returns (thread, outcome) where outcome gets "result" or "error"."""
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = fn(*args)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, outcome
+
+
+def wait_until(condition, timeout=2):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_identical_resubmit_makes_one_model_call(gemini, session):
+    gemini.latency = staticmethod(lambda: 0.3)
+    before = app.get_metrics_snapshot()
+    thread, first = in_thread(ask)
+    wait_until(lambda: "inflight_request" in session)
+    second = ask()
+    thread.join()
+    assert first["result"] is second
+    assert gemini.calls == 1
+    after = app.get_metrics_snapshot()
+    assert after["duplicate_submits"] - before["duplicate_submits"] == 1
+    assert after["model_calls"] - before["model_calls"] == 1
+
+
+def test_changed_inputs_cancel_the_queued_request(gemini, session, monkeypatch):
+    slots = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(app, "get_model_slots", lambda: slots)
+    before = app.get_metrics_snapshot()
+    slots.acquire()  # Another session holds the only slot, so "Laptop" waits for it.
+    thread, stale = in_thread(ask, "Laptop")
+    wait_until(lambda: "inflight_request" in session)
+    old = session["inflight_request"]
+    wait_until(old["future"].running)
+    threading.Timer(0.3, slots.release).start()
+    result = ask("Phone")
+    thread.join()
+    assert old["cancel"].is_set()
+    assert isinstance(stale["error"], app.RequestCancelled)
+    assert app.compute_pds(result) == 10
+    assert gemini.calls == 1
+    after = app.get_metrics_snapshot()
+    assert after["superseded"] - before["superseded"] == 1
+    assert after["calls_cancelled"] - before["calls_cancelled"] == 1
+
+
+def test_cancel_while_waiting_for_a_slot_never_calls_the_model(gemini, monkeypatch):
+    slots = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(app, "get_model_slots", lambda: slots)
+    slots.acquire()
+    cancel = threading.Event()
+    thread, outcome = in_thread(
+        lambda: app.request_factors_from_gemini(1000, "No", "Save", "Mixed", "Laptop", 500.0, cancel_event=cancel)
+    )
+    time.sleep(0.2)
+    cancel.set()
+    thread.join(timeout=2)
+    assert isinstance(outcome["error"], app.RequestCancelled)
+    assert gemini.calls == 0
+    slots.release()
+
+
+def test_abandoned_decision_tool_request_still_fills_the_cache(gemini, session, monkeypatch):
+    cache = app.get_decision_cache.__wrapped__()
+    monkeypatch.setattr(app, "get_decision_cache", lambda: cache)
+
+    def stopped_run(future):
+        # Streamlit stops the page run (e.g. the user switched pages) mid-wait.
+        raise RuntimeError("run stopped")
+
+    monkeypatch.setattr(app, "wait_for_request", stopped_run)
+    with pytest.raises(RuntimeError):
+        app.get_basic_decision("Laptop", 500.0)
+    wait_until(session["inflight_request"]["future"].done)
+    assert app.basic_query_key("Laptop", 500.0) in cache["entries"]
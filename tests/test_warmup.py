@@ -0,0 +1,57 @@
+import pytest
+
+from conftest import app
+
+
+@pytest.fixture
+def empty_cache(monkeypatch):
+    cache = app.get_decision_cache.__wrapped__()
+    monkeypatch.setattr(app, "get_decision_cache", lambda: cache)
+    return cache
+
+
+def test_warmup_budget_counts_model_calls_in_consistency_mode(gemini, empty_cache, monkeypatch):
+    monkeypatch.setattr(app, "CONSISTENCY_ENABLED", True)
+    assert app.run_warmup_pass(call_budget=2) == 0
+    assert gemini.calls == 0
+
+    # Unanimous samples settle after 3 calls, and a query is only started if 5 still fit.
+    assert app.run_warmup_pass(call_budget=10) == 2
+    assert gemini.calls == 6
+
+
+def test_warmup_budget_is_one_call_per_query(gemini, empty_cache):
+    assert app.run_warmup_pass(call_budget=2) == 2
+    assert gemini.calls == 2
+    assert len(empty_cache["entries"]) == 2
+
+
+def test_fractional_reply_is_cached_as_ints(gemini, empty_cache):
+    gemini.reply = staticmethod(lambda: {"D":1.5,"O":"1","G":0,"L":-1,"B":2})
+    assert app.run_warmup_pass(call_budget=1) == 1
+    (entry,) = empty_cache["entries"].values()
+    factors = entry["result"]["factors"]
+    assert [factors[f] for f in "DOGLB"] == [2, 1, 0, -1, 2]
+    assert entry["result"]["pds"] == 4
+
+
+def test_non_numeric_reply_is_not_cached(gemini, empty_cache):
+    gemini.reply = staticmethod(lambda: {"D":"high","O":1,"G":0,"L":0,"B":0})
+    assert app.run_warmup_pass(call_budget=1) == 0
+    assert not empty_cache["entries"]
+
+
+def test_bad_reply_does_not_stop_the_pass(gemini, empty_cache, monkeypatch):
+    build_decision = app.build_decision
+    failures = [TypeError("bad reply")]
+
+    def flaky_build_decision(factors):
+        if failures:
+            raise failures.pop()
+        return build_decision(factors)
+
+    monkeypatch.setattr(app, "build_decision", flaky_build_decision)
+    errors_before = app.get_metrics_snapshot()["warmup_errors"]
+    assert app.run_warmup_pass(call_budget=3) == 2
+    assert gemini.calls == 3
+    assert app.get_metrics_snapshot()["warmup_errors"] == errors_before + 1